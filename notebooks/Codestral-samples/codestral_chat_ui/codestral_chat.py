@@ -1,7 +1,11 @@
 import boto3
+from botocore.config import Config
 import gradio as gr
-import io
 import json
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 # default hyperparameters for llm
@@ -22,30 +26,31 @@ system_prompt = "You are a helpful Assistant, called Codestral. You are meant to
 class ReadLines:
     def __init__(self, stream):
         self.byte_iterator = iter(stream)
-        self.buffer = io.BytesIO()
-        self.read_pos = 0
+        # only unread bytes are kept; consumed lines are dropped from the front
+        self.buffer = bytearray()
 
     def __iter__(self):
         return self
 
     def __next__(self):
         while True:
-            self.buffer.seek(self.read_pos)
-            line = self.buffer.readline()
-            if line and line[-1] == ord("\n"):
-                self.read_pos += len(line)
-                return line[:-1]
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self.buffer[:end])
+                del self.buffer[: end + 1]
+                return line
             try:
                 chunk = next(self.byte_iterator)
             except StopIteration:
-                if self.read_pos < self.buffer.getbuffer().nbytes:
-                    continue
+                if self.buffer:
+                    line = bytes(self.buffer)
+                    self.buffer.clear()
+                    return line
                 raise
             if "PayloadPart" not in chunk:
-                print("Unknown event type:" + chunk)
+                logger.warning("Unknown event type: %s", chunk)
                 continue
-            self.buffer.seek(0, io.SEEK_END)
-            self.buffer.write(chunk["PayloadPart"]["Bytes"])
+            self.buffer += chunk["PayloadPart"]["Bytes"]
 
 
 # helper method to format prompt
@@ -70,9 +75,15 @@ def create_gradio_app(
     system_prompt=system_prompt,
     format_prompt=format_prompt,
     concurrency_limit=4,
+    max_queue_size=64,
     share=True,
 ):
-    smr = session.client("sagemaker-runtime")
+    # grow the connection pool with a numeric concurrency limit (never below botocore's default of 10);
+    # None or "default" keep botocore's default pool size
+    client_config = {"tcp_keepalive": True}
+    if isinstance(concurrency_limit, int):
+        client_config["max_pool_connections"] = max(concurrency_limit, 10)
+    smr = session.client("sagemaker-runtime", config=Config(**client_config))
 
     def generate(
         prompt,
@@ -87,17 +98,19 @@ def create_gradio_app(
             ContentType="application/json",
         )
 
+        stop = parameters["stop"]
         output = ""
         for c in ReadLines(resp["Body"]):
             c = c.decode("utf-8")
             if c.startswith("data:"):
-                chunk = json.loads(c.lstrip("data:").rstrip("/n"))
-                if chunk["token"]["special"]:
+                token = json.loads(c[5:])["token"]
+                if token["special"]:
                     continue
-                if chunk["token"]["text"] in request["parameters"]["stop"]:
+                text = token["text"]
+                if text in stop:
                     break
-                output += chunk["token"]["text"]
-                for stop_str in request["parameters"]["stop"]:
+                output += text
+                for stop_str in stop:
                     if output.endswith(stop_str):
                         output = output[: -len(stop_str)]
                         output = output.rstrip()
@@ -106,6 +119,8 @@ def create_gradio_app(
                 yield output
         return output
 
-    demo = gr.ChatInterface(generate, title="Chat with Codestral", concurrency_limit=4, chatbot=gr.Chatbot(layout="panel"))
+    demo = gr.ChatInterface(generate, title="Chat with Codestral", concurrency_limit=concurrency_limit, chatbot=gr.Chatbot(layout="panel"))
 
+    # bound the queue so bursts beyond the endpoint's capacity are rejected instead of piling up
+    demo.queue(max_size=max_queue_size)
     demo.launch(share=share)